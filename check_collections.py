@@ -1,29 +1,116 @@
-import chromadb
+import argparse
+import json
+import os
 import sys
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List
+
+class IndexDatabaseNotFoundError(FileNotFoundError):
+    """The project index directory exists but holds no ChromaDB database."""
+
+@dataclass
+class CollectionInfo:
+    name: str
+    count: int
+
+@lru_cache(maxsize=8)
+def _get_client(path: str):
+    """Returns a ChromaDB client for the given path, reusing it across calls in the same process."""
+    # Imported here so usage errors and missing directories don't pay chromadb's import time
+    try:
+        import chromadb
+    except ImportError as e:
+        raise ImportError("chromadb is not installed. Install it with: pip install -r requirements.txt") from e
+    return chromadb.PersistentClient(path=path)
+
+def check(project_id: str) -> List[CollectionInfo]:
+    """
+    Lists the ChromaDB collections of a project together with their item counts.
+
+    Args:
+        project_id: The project directory name under 'indexes/' (e.g., 'project_1')
+
+    Returns:
+        List of CollectionInfo entries, one per collection
+
+    Raises:
+        FileNotFoundError: If the project index directory doesn't exist
+        IndexDatabaseNotFoundError: If the directory has no chroma.sqlite3 database
+    """
+    index_dir = os.path.join("indexes", project_id)
+    try:
+        with os.scandir(index_dir) as entries:
+            has_index = any(entry.name == "chroma.sqlite3" for entry in entries)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Project index directory not found: {index_dir}") from None
+
+    # Opening a client on a directory without a database would only create an empty one
+    if not has_index:
+        raise IndexDatabaseNotFoundError(f"No ChromaDB database (chroma.sqlite3) in project index directory: {index_dir}")
+
+    client = _get_client(index_dir)
+    collections = client.list_collections()
+    if not collections:
+        return []
+
+    # count() is already a store-side aggregate (chroma exposes no cheaper estimated count),
+    # but each call is a separate round trip to the store, so issue them concurrently
+    with ThreadPoolExecutor(max_workers=min(32, len(collections))) as executor:
+        counts = list(executor.map(lambda collection: collection.count(), collections))
+    return [CollectionInfo(collection.name, count) for collection, count in zip(collections, counts)]
+
+def check_many(project_ids: Iterable[str]) -> Dict[str, List[CollectionInfo]]:
+    """
+    Checks several projects in one process, sharing the cached ChromaDB clients.
+
+    Args:
+        project_ids: The project directory names under 'indexes/'
+
+    Returns:
+        Dict mapping each project ID to its list of CollectionInfo entries
+    """
+    project_ids = list(project_ids)
+    if not project_ids:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(8, len(project_ids))) as executor:
+        return dict(zip(project_ids, executor.map(check, project_ids)))
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python check_collections.py <project_id>")
-        return
-    
-    project_id = sys.argv[1]
-    index_dir = Path("indexes") / project_id
-    
-    if not index_dir.exists():
-        print(f"Error: Project index directory not found: {index_dir}")
-        return
-    
-    print(f"Checking ChromaDB collections for project: {project_id}")
+    parser = argparse.ArgumentParser(description="Check the ChromaDB collections of an indexed project")
+    parser.add_argument("project_id", help="Project directory name under indexes/ (e.g. project_1)")
+    parser.add_argument("--json", action="store_true", help="Print the collections as JSON")
+    args = parser.parse_args()
+
+    project_id = args.project_id
+
+    # Exit non-zero on failure so shell loops over projects can stop early.
+    # Usage errors already exit with code 2 from argparse.
     try:
-        client = chromadb.PersistentClient(path=str(index_dir))
-        collections = client.list_collections()
-        print(f"Found {len(collections)} collections:")
-        for collection in collections:
-            print(f"  - {collection.name}")
-            print(f"    Count: {collection.count()}")
+        collections = check(project_id)
+    except IndexDatabaseNotFoundError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(4)
+    except FileNotFoundError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(3)
     except Exception as e:
-        print(f"Error: {e}")
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps([asdict(info) for info in collections]))
+        return
+
+    # Build the whole report and write it once instead of printing line by line
+    lines = [
+        f"Checking ChromaDB collections for project: {project_id}",
+        f"Found {len(collections)} collections:",
+    ]
+    for info in collections:
+        lines.append(f"  - {info.name}\n    Count: {info.count}")
+    sys.stdout.write("\n".join(lines) + "\n")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
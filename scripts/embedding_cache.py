@@ -0,0 +1,82 @@
+"""
+SQLite-backed cache of text embeddings used by the indexing script.
+
+Vendored code, license headers and shared utilities show up in many projects and
+subfolders; with the cache each distinct text is only sent to the embedding model once.
+"""
+
+import hashlib
+import sqlite3
+import threading
+from array import array
+from typing import List
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.embeddings import BaseEmbedding
+
+# SQLite caps the number of bound parameters per statement
+_LOOKUP_BATCH_SIZE = 500
+
+
+class CachedEmbedding(BaseEmbedding):
+    """Wraps an embedding model so texts embedded before are read from disk instead of re-embedded."""
+
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _key_prefix: str = PrivateAttr()
+    _conn: sqlite3.Connection = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr()
+
+    def __init__(self, embed_model: BaseEmbedding, cache_path: str, **kwargs):
+        super().__init__(
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+            **kwargs
+        )
+        self._embed_model = embed_model
+        # Vectors truncated to another size (OpenAI's dimensions) must not share cache entries
+        dimensions = getattr(embed_model, "dimensions", None)
+        self._key_prefix = f"{self.model_name}:{dimensions}" if dimensions else self.model_name
+        # Shared by the indexing threads; every access goes through the lock
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.blake2b(f"{self._key_prefix}\0{text}".encode("utf-8"), digest_size=32).digest()
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed_model.get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return await self._embed_model.aget_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        cached = {}
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_BATCH_SIZE):
+                batch = keys[start:start + _LOOKUP_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                cached.update(self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ))
+
+        misses = [i for i, key in enumerate(keys) if key not in cached]
+        if misses:
+            # Only the texts not seen before reach the model, in a single batch
+            embeddings = self._embed_model._get_text_embeddings([texts[i] for i in misses])
+            rows = [(keys[i], array("f", embedding).tobytes()) for i, embedding in zip(misses, embeddings)]
+            with self._lock:
+                self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+                self._conn.commit()
+            cached.update(rows)
+
+        return [array("f", cached[key]).tolist() for key in keys]
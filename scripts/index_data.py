@@ -1,35 +1,31 @@
 #!/usr/bin/env python3
 """
 Script to index documents from data/ directory using LlamaIndex and ChromaDB.
-This creates a persisted index that can be loaded by the FastAPI application.
+This creates persisted ChromaDB collections that can be loaded by the FastAPI application.
 
 Run: python -m scripts.index_data
 """
 
+import hashlib
+import json
 import os
 import sys
 import shutil
+import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
+from types import SimpleNamespace
 from dotenv import load_dotenv
-from typing import List
-
-import chromadb
-from llama_index.core import (
-    VectorStoreIndex, SimpleDirectoryReader, Settings
-)
-from llama_index.vector_stores.chroma import ChromaVectorStore
-from llama_index.core.storage.storage_context import StorageContext
-from llama_index.core.node_parser import SentenceSplitter, CodeSplitter
-from llama_index.core.schema import Document
-from llama_index.core.storage.docstore import SimpleDocumentStore
-from llama_index.core.storage.index_store import SimpleIndexStore
-from llama_index.llms.openai import OpenAI
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from llama_index.embeddings.openai import OpenAIEmbedding
+from typing import TYPE_CHECKING, Dict, Iterator, List, Tuple
+
+if TYPE_CHECKING:
+    import chromadb
 
 # Import model constants from local file
-from .model_constants import HF_EMBEDDING_MODEL, OPENAI_EMBEDDING_MODEL
+from .model_constants import HF_EMBEDDING_MODEL, OPENAI_EMBEDDING_DIMS, OPENAI_EMBEDDING_MODEL
 
 # === Constants and Configuration ===
 load_dotenv()
@@ -47,13 +43,51 @@ CODE_EXTENSIONS = {
 
 TEXT_EXTENSIONS = {".txt", ".md"}
 
+INDEXED_EXTENSIONS = frozenset(CODE_EXTENSIONS | TEXT_EXTENSIONS)
+
 EXCLUDE_DIRS = {"node_modules", "__pycache__", "venv", ".git", ".idea", ".vscode", "dist", "build"}
 
 # Use imported constants
 DEFAULT_HF_EMBEDDING_MODEL = HF_EMBEDDING_MODEL
 DEFAULT_OPENAI_EMBEDDING_MODEL = OPENAI_EMBEDDING_MODEL
 USE_HF_EMBEDDING = os.getenv("USE_HF_EMBEDDING", "false").lower() == "true"
+# Stored in each collection's metadata; an incremental run rebuilds collections embedded differently
+EMBEDDING_SIGNATURE = DEFAULT_HF_EMBEDDING_MODEL if USE_HF_EMBEDDING else f"{DEFAULT_OPENAI_EMBEDDING_MODEL}:{OPENAI_EMBEDDING_DIMS}"
 FORCE_REINDEX = os.getenv("FORCE_REINDEX", "false").lower() == "true"
+# Re-embed only the files that changed since the last run instead of skipping
+# already indexed projects
+INCREMENTAL_REINDEX = os.getenv("INCREMENTAL_REINDEX", "false").lower() == "true"
+MANIFEST_FILE = "manifest.json"
+# Embeddings are cached on disk by (model, text), so text seen in any earlier run or
+# project is not embedded again
+USE_EMBEDDING_CACHE = os.getenv("USE_EMBEDDING_CACHE", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = INDEX_DIR / "embedding_cache.sqlite3"
+
+# Chunks embedded per request/forward pass (LlamaIndex defaults to 10)
+OPENAI_EMBED_BATCH_SIZE = 256
+HF_EMBED_BATCH_SIZE = 64
+
+# Chunks buffered before they are embedded and written to the vector store
+INSERT_BATCH_SIZE = 256
+# Files split together with one get_nodes_from_documents call per splitter
+SPLIT_BATCH_FILES = 64
+
+# Rows per add() when moving a staged collection into the project store; stays
+# below the SQLite bound on a single Chroma batch
+COPY_BATCH_SIZE = 5000
+
+# Chunks shorter than this (license headers, import blocks) are dropped unless they are
+# all their file has; longer than this, they are split so the embedder doesn't truncate them
+MIN_CHUNK_TOKENS = 16
+MAX_CHUNK_TOKENS = 8000
+
+# Larger files are skipped: at this size they are generated or vendored, not source
+MAX_FILE_BYTES = 2_000_000
+
+# Collections of a project indexed concurrently. Threads rather than processes: the
+# ChromaDB store of a project can't be written from several processes, and the OpenAI
+# calls release the GIL. Local HF models already use every core through torch.
+INDEX_WORKERS = 1 if USE_HF_EMBEDDING else int(os.getenv("INDEX_WORKERS", "4"))
 
 SUPPORTED_CODE_LANGUAGES = {
     "c", "cpp", "csharp", "go", "html", "java", "javascript",
@@ -70,6 +104,109 @@ EXTENSION_TO_LANGUAGE = {
 }
 
 # === Helper Functions ===
+@lru_cache(maxsize=None)
+def _get_llama() -> SimpleNamespace:
+    """
+    Imports ChromaDB and the LlamaIndex classes used for indexing on first use.
+
+    These imports take seconds, so they are deferred until there is something to index.
+    """
+    import chromadb
+    from llama_index.core import VectorStoreIndex, Settings
+    from llama_index.vector_stores.chroma import ChromaVectorStore
+    from llama_index.core.node_parser import SentenceSplitter, CodeSplitter
+    from llama_index.core.schema import Document, TextNode
+
+    return SimpleNamespace(
+        chromadb=chromadb,
+        VectorStoreIndex=VectorStoreIndex,
+        Settings=Settings,
+        ChromaVectorStore=ChromaVectorStore,
+        SentenceSplitter=SentenceSplitter,
+        CodeSplitter=CodeSplitter,
+        Document=Document,
+        TextNode=TextNode,
+    )
+
+_staging_client_lock = threading.Lock()
+
+def _get_staging_client():
+    """In-memory ChromaDB client that fresh collections are built in before being copied to disk."""
+    # lru_cache doesn't serialize the first call, and chromadb's shared system setup fails
+    # when several index workers create ephemeral clients at once
+    with _staging_client_lock:
+        return _create_staging_client()
+
+@lru_cache(maxsize=None)
+def _create_staging_client():
+    return _get_llama().chromadb.EphemeralClient()
+
+def chunk_id(relative_path: str, chunk: int) -> str:
+    """Deterministic ID of a file's chunk, so re-indexing a file replaces its chunks instead of duplicating them."""
+    return hashlib.blake2b(f"{relative_path}:{chunk}".encode("utf-8"), digest_size=16).hexdigest()
+
+def copy_collection(source, target) -> int:
+    """Copy all rows of a ChromaDB collection into another in large batches. Returns the row count."""
+    copied = 0
+    while True:
+        rows = source.get(include=["embeddings", "documents", "metadatas"], limit=COPY_BATCH_SIZE, offset=copied)
+        if not rows["ids"]:
+            return copied
+        target.upsert(
+            ids=rows["ids"],
+            embeddings=rows["embeddings"],
+            documents=rows["documents"],
+            metadatas=rows["metadatas"]
+        )
+        copied += len(rows["ids"])
+
+@lru_cache(maxsize=None)
+def _get_tokenizer():
+    # cl100k_base is the encoding of the OpenAI embedding models (tiktoken ships with llama-index)
+    import tiktoken
+    return tiktoken.get_encoding("cl100k_base")
+
+def filter_chunks(nodes: List) -> List:
+    """
+    Drop chunks that aren't worth an embedding call and split ones the embedder would truncate.
+
+    Repeated chunk texts are only dropped within a file, since chunks are deleted and
+    routed to by their file's path. Every file keeps at least one chunk.
+
+    Args:
+        nodes: Chunks of one or more whole files, in file order
+
+    Returns:
+        List of the chunks to embed
+    """
+    encoding = _get_tokenizer()
+    TextNode = _get_llama().TextNode
+    # Chunks of each file (in order) with their tokens, without repeated texts
+    files = {}
+    seen = set()
+    for node in nodes:
+        digest = hashlib.blake2b(node.text.encode("utf-8"), digest_size=16).digest()
+        if (node.ref_doc_id, digest) in seen:
+            continue
+        seen.add((node.ref_doc_id, digest))
+        files.setdefault(node.ref_doc_id, []).append((node, encoding.encode(node.text, disallowed_special=())))
+
+    kept = []
+    for chunks in files.values():
+        long_enough = [(node, tokens) for node, tokens in chunks if len(tokens) >= MIN_CHUNK_TOKENS]
+        for node, tokens in long_enough or chunks[:1]:
+            if len(tokens) <= MAX_CHUNK_TOKENS:
+                kept.append(node)
+                continue
+            for start in range(0, len(tokens), MAX_CHUNK_TOKENS):
+                kept.append(TextNode(
+                    id_=f"{node.node_id}-{start // MAX_CHUNK_TOKENS}",
+                    text=encoding.decode(tokens[start:start + MAX_CHUNK_TOKENS]),
+                    metadata=dict(node.metadata),
+                    relationships=dict(node.relationships)
+                ))
+    return kept
+
 def validate_env():
     if not USE_HF_EMBEDDING:
         openai_key = os.getenv("OPENAI_API_KEY")
@@ -78,26 +215,116 @@ def validate_env():
             sys.exit(1)
 
 def configure_settings():
+    Settings = _get_llama().Settings
     if USE_HF_EMBEDDING:
         print("🔧 Using Hugging Face embedding model...")
-        Settings.embed_model = HuggingFaceEmbedding(model_name=DEFAULT_HF_EMBEDDING_MODEL)
+        # Only imported on this path since it pulls in torch/transformers
+        from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+        # The device is left unset so the model is placed on CUDA/MPS when available
+        Settings.embed_model = HuggingFaceEmbedding(
+            model_name=DEFAULT_HF_EMBEDDING_MODEL,
+            embed_batch_size=HF_EMBED_BATCH_SIZE
+        )
     else:
         print("🔧 Using OpenAI embedding model...")
-        Settings.embed_model = OpenAIEmbedding(model=DEFAULT_OPENAI_EMBEDDING_MODEL)
+        from llama_index.embeddings.openai import OpenAIEmbedding
+        Settings.embed_model = OpenAIEmbedding(
+            model=DEFAULT_OPENAI_EMBEDDING_MODEL,
+            dimensions=OPENAI_EMBEDDING_DIMS,
+            embed_batch_size=OPENAI_EMBED_BATCH_SIZE
+        )
+
+    if USE_EMBEDDING_CACHE:
+        from .embedding_cache import CachedEmbedding
+        INDEX_DIR.mkdir(parents=True, exist_ok=True)
+        print(f"🔧 Caching embeddings in {EMBEDDING_CACHE_PATH}")
+        Settings.embed_model = CachedEmbedding(Settings.embed_model, str(EMBEDDING_CACHE_PATH))
 
 def get_all_files(data_dir: Path) -> List[str]:
+    # scandir entries carry their type, so the walk needs no extra stat per entry
     file_paths = []
-    for root, dirs, files in os.walk(data_dir):
-        dirs[:] = [d for d in dirs if d not in EXCLUDE_DIRS]
-        for file in files:
-            if Path(file).suffix in CODE_EXTENSIONS or Path(file).suffix in TEXT_EXTENSIONS:
-                file_paths.append(os.path.join(root, file))
+    stack = [str(data_dir)]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in EXCLUDE_DIRS:
+                        stack.append(entry.path)
+                elif os.path.splitext(entry.name)[1] in INDEXED_EXTENSIONS:
+                    file_paths.append(entry.path)
     return file_paths
 
-def load_documents(file_paths: List[str]):
+def load_documents(file_paths: List[str]) -> Iterator:
+    """
+    Yields one document per file, reading the files one at a time.
+
+    Only code and text files are indexed, so they are read directly instead of going
+    through SimpleDirectoryReader's per-format readers. Empty and oversized files are skipped.
+    """
     print(f"📥 Loading {len(file_paths)} files...")
-    reader = SimpleDirectoryReader(input_files=file_paths, recursive=True, exclude_hidden=True)
-    return reader.load_data()
+    Document = _get_llama().Document
+    for path in file_paths:
+        try:
+            if os.stat(path).st_size > MAX_FILE_BYTES:
+                print(f"  ⚠️  Skipping {path}: larger than {MAX_FILE_BYTES} bytes")
+                continue
+            with open(path, "rb") as f:
+                text = f.read().decode("utf-8", errors="replace")
+        except OSError as e:
+            print(f"  ⚠️  Could not read {path}: {e}")
+            continue
+        if not text.strip():
+            continue
+        yield Document(text=text, metadata={"file_name": os.path.basename(path), "file_path": path})
+
+def read_manifest(storage_dir: Path) -> Dict[str, Dict]:
+    """Read the {relative path: file signature} manifest written by the last indexing run."""
+    try:
+        with open(storage_dir / MANIFEST_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_manifest(storage_dir: Path, manifest: Dict[str, Dict]):
+    """Replace the manifest atomically, so an interrupted write leaves the previous one in place."""
+    storage_dir.mkdir(parents=True, exist_ok=True)
+    temp_path = storage_dir / f"{MANIFEST_FILE}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, storage_dir / MANIFEST_FILE)
+
+def _sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def partition_files(file_paths: List[str], subfolder: Path, manifest: Dict[str, Dict]) -> Tuple[List[str], Dict[str, Dict]]:
+    """
+    Split files into those that need embedding and those unchanged since the last run.
+
+    A file is unchanged if its mtime and size match the manifest. Otherwise its SHA-1 is
+    compared, so files that were only touched (e.g. by a fresh checkout) aren't re-embedded.
+
+    Returns:
+        Tuple of (paths of new or changed files, manifest for the current files)
+    """
+    stale_paths = []
+    new_manifest = {}
+    for path in file_paths:
+        relative_path = str(Path(path).relative_to(subfolder))
+        stat = os.stat(path)
+        entry = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+        previous = manifest.get(relative_path)
+        if previous and previous["mtime_ns"] == entry["mtime_ns"] and previous["size"] == entry["size"]:
+            entry["sha1"] = previous["sha1"]
+        else:
+            entry["sha1"] = _sha1(path)
+            if not previous or previous["sha1"] != entry["sha1"]:
+                stale_paths.append(path)
+        new_manifest[relative_path] = entry
+    return stale_paths, new_manifest
 
 # === Updated Helper Functions ===
 def get_all_projects(data_dir: Path) -> List[Path]:
@@ -112,106 +339,210 @@ def create_collection_name(project_name: str, subfolder_name: str) -> str:
     """Create a unique collection name for a subfolder within a project."""
     return f"{project_name}_{subfolder_name}"
 
-def create_collection_index(project_dir: Path, subfolder: Path, chroma_client: chromadb.PersistentClient, project_name: str):
+def create_collection_index(project_dir: Path, subfolder: Path, chroma_client: "chromadb.PersistentClient", project_name: str):
     """Create an index for a specific subfolder within a project."""
+    llama = _get_llama()
     subfolder_name = subfolder.name
-    collection_name = create_collection_name(project_name, subfolder_name)
+    # Interned since every chunk's metadata refers to these (and to its file's path)
+    project_name = sys.intern(project_name)
+    collection_name = sys.intern(create_collection_name(project_name, subfolder_name))
     
     print(f"  ⚙️  Creating collection '{collection_name}'...")
+    created = False
     try:
         collection = chroma_client.get_collection(collection_name)
-        if FORCE_REINDEX:
+        # Vectors of another model or size can't be mixed into the collection
+        embedded_differently = (collection.metadata or {}).get("embedding") != EMBEDDING_SIGNATURE
+        if FORCE_REINDEX or embedded_differently:
             print(f"  🗑️  Removing old collection '{collection_name}'")
             chroma_client.delete_collection(collection_name)
-            collection = chroma_client.create_collection(collection_name)
+            collection = chroma_client.create_collection(collection_name, metadata={"embedding": EMBEDDING_SIGNATURE})
+            created = True
     except Exception:
-        collection = chroma_client.create_collection(collection_name)
-    
-    vector_store = ChromaVectorStore(chroma_collection=collection)
+        collection = chroma_client.create_collection(collection_name, metadata={"embedding": EMBEDDING_SIGNATURE})
+        created = True
     
     # Create a storage directory for this collection
     collection_storage_dir = INDEX_DIR / project_name / f"storage_{subfolder_name}"
-    
-    # Ensure the directory exists and is empty
-    if collection_storage_dir.exists():
-        shutil.rmtree(collection_storage_dir)
-    collection_storage_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Create a new storage context without trying to load existing files
-    storage_context = StorageContext.from_defaults(
-        vector_store=vector_store,
-        docstore=SimpleDocumentStore(),
-        index_store=SimpleIndexStore(),
-        persist_dir=str(collection_storage_dir)
-    )
+
+    # The manifest only describes chunks still in the collection if it wasn't recreated
+    manifest = {} if created else read_manifest(collection_storage_dir)
 
     print(f"  📥 Loading files for collection '{collection_name}'...")
     file_paths = get_all_files(subfolder)
-    if not file_paths:
+    if not file_paths and not manifest:
         print(f"  ⚠️  No files found in collection '{collection_name}'. Skipping...")
         return
 
-    documents = load_documents(file_paths)
+    stale_paths, new_manifest = partition_files(file_paths, subfolder, manifest)
+    removed = [path for path in manifest if path not in new_manifest]
+    if not stale_paths and not removed:
+        print(f"  ✅ Collection '{collection_name}' is up to date. Skipping...")
+        return
 
-    print(f"  📐 Splitting documents for collection '{collection_name}'...")
-    transformed_documents = []
-    for doc in documents:
-        file_name = doc.metadata.get('file_name', '')
-        file_extension = Path(file_name).suffix
-        file_path = doc.metadata.get('file_path', '')
-        language = EXTENSION_TO_LANGUAGE.get(file_extension)
+    # Chunk IDs are deterministic and adding an existing ID is a no-op, so the old chunks
+    # of every file about to be embedded are deleted first, not only those the manifest
+    # knows about (a failed run may have left chunks the manifest doesn't list)
+    outdated = removed + [str(Path(path).relative_to(subfolder)) for path in stale_paths]
+    if not created:
+        print(f"  🗑️  Removing chunks of {len(outdated)} changed or deleted files from '{collection_name}'")
+        for start in range(0, len(outdated), INSERT_BATCH_SIZE):
+            collection.delete(where={"file_path": {"$in": outdated[start:start + INSERT_BATCH_SIZE]}})
+    print(f"  🔁 {len(stale_paths)} of {len(file_paths)} files need embedding")
+
+    # A fresh collection is built in memory and written to the project store in a few
+    # large batches at the end, rather than one SQLite transaction per insert batch.
+    # Incremental updates are small, so they go straight to the persistent collection.
+    staging_collection = None
+    if created:
+        staging_client = _get_staging_client()
+        try:
+            staging_client.delete_collection(collection_name)
+        except Exception:
+            pass
+        staging_collection = staging_client.create_collection(collection_name)
+    vector_store = llama.ChromaVectorStore(chroma_collection=staging_collection if staging_collection is not None else collection)
+    
+    # Chroma holds the chunk texts and vectors, so the index is loaded straight from the
+    # vector store and the directory only keeps the manifest (no docstore/index store is
+    # persisted). The previous manifest stays until this run succeeds, unless the
+    # collection was recreated and no longer holds the chunks it lists.
+    collection_storage_dir.mkdir(parents=True, exist_ok=True)
+    if created:
+        (collection_storage_dir / MANIFEST_FILE).unlink(missing_ok=True)
+
+    documents = load_documents(stale_paths) if stale_paths else []
+
+    print(f"  📐 Splitting and indexing documents for collection '{collection_name}'...")
+    index = llama.VectorStoreIndex.from_vector_store(vector_store)
 
-        use_code_splitter = file_extension in CODE_EXTENSIONS if file_extension else False
+    # Per-file values are worked out once per document, not per chunk; the relative
+    # path is shared (interned) by all chunks of the file and also keys their IDs
+    relative_paths = {}
+    node_id = lambda i, doc: chunk_id(relative_paths[doc.id_], i)
 
-        if use_code_splitter:
+    # Building a CodeSplitter loads a tree-sitter grammar, so build one per language and
+    # reuse it. A language whose splitter can't be built is cached as the exception.
+    sentence_splitter = llama.SentenceSplitter(chunk_size=1024, chunk_overlap=200, id_func=node_id)
+    code_splitters = {}
+
+    def get_code_splitter(language):
+        if language not in code_splitters:
             try:
-                splitter = CodeSplitter(language=language)
-                chunks = splitter.split_text(doc.text)
+                code_splitters[language] = llama.CodeSplitter(language=language, id_func=node_id)
             except Exception as e:
-                print(f"  ⚠️  CodeSplitter failed for {file_name}, falling back to SentenceSplitter: {e}")
-                splitter = SentenceSplitter(chunk_size=1024, chunk_overlap=200)
-                chunks = splitter.split_text(doc.text)
-        else:
-            splitter = SentenceSplitter(chunk_size=1024, chunk_overlap=200)
-            chunks = splitter.split_text(doc.text)
-
-        for i, chunk in enumerate(chunks):
-            trimmed_file_path = str(Path(file_path).relative_to(subfolder))
-            transformed_documents.append(
-                Document(
-                    text=chunk,
-                    metadata={
-                        "file_name": file_name,
-                        "file_path": trimmed_file_path,
-                        "chunk": i,
-                        "language": language,
-                        "collection": collection_name,
-                        "project": project_name
-                    }
-                )
-            )
-
-    print(f"  📝 Creating index with {len(transformed_documents)} chunks for collection '{collection_name}'...")
-    index = VectorStoreIndex.from_documents(transformed_documents, storage_context=storage_context)
-
-    print(f"  💾 Persisting index for collection '{collection_name}'...")
-    index.storage_context.persist(persist_dir=str(collection_storage_dir))
+                code_splitters[language] = e
+        splitter = code_splitters[language]
+        if isinstance(splitter, Exception):
+            raise splitter
+        return splitter
+
+    def split_group(use_code_splitter, language, group):
+        """Split documents sharing a splitter with one get_nodes_from_documents call."""
+        if not use_code_splitter:
+            return sentence_splitter.get_nodes_from_documents(group)
+        try:
+            return get_code_splitter(language).get_nodes_from_documents(group)
+        except Exception:
+            pass
+        # One unparsable file fails the whole call, so retry file by file to isolate it
+        nodes = []
+        for doc in group:
+            try:
+                nodes.extend(get_code_splitter(language).get_nodes_from_documents([doc]))
+            except Exception as e:
+                print(f"  ⚠️  CodeSplitter failed for {doc.metadata.get('file_name', '')}, falling back to SentenceSplitter: {e}")
+                nodes.extend(sentence_splitter.get_nodes_from_documents([doc]))
+        return nodes
+
+    def index_groups(groups):
+        """Split the buffered documents, annotate the chunks and insert them. Returns the chunk count."""
+        count = 0
+        for (use_code_splitter, language), group in groups.items():
+            nodes = filter_chunks(split_group(use_code_splitter, language, group))
+            # The splitters copy the document metadata into each node; add the chunk fields
+            chunk_numbers = {}
+            for node in nodes:
+                i = chunk_numbers.get(node.ref_doc_id, 0)
+                chunk_numbers[node.ref_doc_id] = i + 1
+                node.metadata.update({
+                    "file_path": relative_paths[node.ref_doc_id],
+                    "chunk": i,
+                    "language": language,
+                    "collection": collection_name,
+                    "project": project_name
+                })
+            for start in range(0, len(nodes), INSERT_BATCH_SIZE):
+                index.insert_nodes(nodes[start:start + INSERT_BATCH_SIZE])
+            count += len(nodes)
+        relative_paths.clear()
+        return count
+
+    # Documents are buffered per (splitter, language) and split in groups of
+    # SPLIT_BATCH_FILES files, so at most one group's chunks are held in memory
+    groups = {}
+    buffered = 0
+    chunk_count = 0
+    subfolder_path = str(subfolder)
+    for doc in documents:
+        file_extension = os.path.splitext(doc.metadata.get('file_name', ''))[1]
+        language = EXTENSION_TO_LANGUAGE.get(file_extension)
+        use_code_splitter = file_extension in CODE_EXTENSIONS
+        relative_paths[doc.id_] = sys.intern(os.path.relpath(doc.metadata.get('file_path', ''), subfolder_path))
+
+        groups.setdefault((use_code_splitter, language), []).append(doc)
+        buffered += 1
+        if buffered >= SPLIT_BATCH_FILES:
+            chunk_count += index_groups(groups)
+            groups = {}
+            buffered = 0
+
+    chunk_count += index_groups(groups)
+    print(f"  📝 Indexed {chunk_count} chunks for collection '{collection_name}'")
+
+    if staging_collection is not None:
+        try:
+            print(f"  📤 Writing {copy_collection(staging_collection, collection)} chunks to collection '{collection_name}'...")
+        finally:
+            _get_staging_client().delete_collection(collection_name)
+
+    write_manifest(collection_storage_dir, new_manifest)
 
 def create_project_index(project_dir: Path):
     """Create an index for a specific project and its subfolders."""
     project_name = project_dir.name
     project_index_dir = INDEX_DIR / project_name
 
-    if project_index_dir.exists() and not FORCE_REINDEX:
+    if project_index_dir.exists() and not (FORCE_REINDEX or INCREMENTAL_REINDEX):
         print(f"✅ Index for project '{project_name}' already exists. Skipping...")
         return
 
-    if project_index_dir.exists():
+    # The old index is moved aside rather than deleted up front: it is restored if
+    # indexing fails, and otherwise deleted in the background while indexing continues
+    old_index_dir = None
+    if project_index_dir.exists() and FORCE_REINDEX:
         print(f"🗑️  Removing old index for project '{project_name}'")
-        shutil.rmtree(project_index_dir)
+        old_index_dir = project_index_dir.with_name(f"{project_name}.old.{int(time.time())}")
+        project_index_dir.rename(old_index_dir)
+
+    try:
+        index_project_subfolders(project_dir, project_index_dir)
+    except Exception:
+        if old_index_dir is not None:
+            print(f"↩️  Restoring previous index for project '{project_name}'")
+            shutil.rmtree(project_index_dir, ignore_errors=True)
+            old_index_dir.rename(project_index_dir)
+        raise
+
+    if old_index_dir is not None:
+        threading.Thread(target=shutil.rmtree, args=(old_index_dir,), kwargs={"ignore_errors": True}).start()
+
+def index_project_subfolders(project_dir: Path, project_index_dir: Path):
+    """Create the collections of a project's subfolders in its index directory."""
+    project_name = project_dir.name
 
     print(f"⚙️  Initializing ChromaDB for project '{project_name}'...")
-    chroma_client = chromadb.PersistentClient(path=str(project_index_dir))
+    chroma_client = _get_llama().chromadb.PersistentClient(path=str(project_index_dir))
 
     # Get all subfolders in the project
     subfolders = get_project_subfolders(project_dir)
@@ -220,21 +551,25 @@ def create_project_index(project_dir: Path):
         return
 
     # Create collections for each subfolder
-    for subfolder in subfolders:
-        create_collection_index(project_dir, subfolder, chroma_client, project_name)
+    with ThreadPoolExecutor(max_workers=min(INDEX_WORKERS, len(subfolders))) as executor:
+        list(executor.map(
+            lambda subfolder: create_collection_index(project_dir, subfolder, chroma_client, project_name),
+            subfolders
+        ))
 
     print(f"✅ Project '{project_name}' indexing complete!")
 
 # === Updated Entry Point ===
 def main():
     try:
-        validate_env()
-        configure_settings()
         projects = get_all_projects(DATA_DIR)
         if not projects:
             print("⚠️  No projects found in the data directory.")
             return
 
+        validate_env()
+        configure_settings()
+
         for project in projects:
             create_project_index(project)
     except Exception as e:
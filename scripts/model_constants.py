@@ -4,6 +4,9 @@ Constants file for AI model names and configurations used in the scripts.
 
 # OpenAI Embedding Models
 OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+# Vectors are truncated to this many dimensions by the API (1536 is the model's full size).
+# Must match between the indexing scripts and the agent; changing it requires a full reindex
+OPENAI_EMBEDDING_DIMS = 512
 
 # Hugging Face Embedding Models
 HF_EMBEDDING_MODEL = "BAAI/bge-large-en-v1.5"
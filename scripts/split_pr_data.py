@@ -6,35 +6,216 @@ Supports both legacy and updated JSON schemas (with `summary`, `full_diff`, `dif
  
 import os
 import sys
+import re
 import json
 import argparse
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+ 
+# ijson is optional: with it the `files` list of a PR is streamed instead of loaded whole
+try:
+    import ijson
+except ImportError:
+    ijson = None
+ 
+# orjson is optional: it serializes in C and is several times faster than json for
+# the per-file writes below, but the stdlib module produces the same files
+try:
+    import orjson
+except ImportError:
+    orjson = None
+ 
+logger = logging.getLogger(__name__)
  
 # Constants
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
 PR_DATA_DIR = os.path.join(DATA_DIR, "pr_data")
+# "json" writes modified_files/<path>.json per file (what the agent reads); "jsonl" and
+# "msgpack" write every file into a single modified_files.<format> stream
+OUTPUT_FORMATS = ("json", "jsonl", "msgpack")
+WRITE_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+# Names of the PR data files picked up by --directory; extend this one pattern rather
+# than chaining endswith checks
+PR_DATA_FILE_RE = re.compile(r"\.json\Z")
+ 
+ 
+def _load_json(path: str) -> Any:
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r') as f:
+        return json.load(f)
+ 
+ 
+def _dump_json(obj: Any, path: str) -> None:
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+        return
+    # Encoded to one string and written at once: json.dump issues a write per token
+    with open(path, 'w') as f:
+        f.write(json.dumps(obj, indent=2))
+ 
+ 
+def _read_pr_fields(path: str) -> Tuple[Dict, bool]:
+    """
+    Read the top-level PR fields other than `files`, without building the file list.
+ 
+    Returns:
+        Tuple of (fields, whether the PR has a `files` field)
+    """
+    fields = {}
+    has_files = False
+    key = None
+    builder = None
+    with open(path, 'rb') as f:
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            if prefix == '':
+                if event == 'map_key':
+                    key = value
+                    has_files = has_files or key == 'files'
+                    builder = None if key == 'files' else ijson.ObjectBuilder()
+                continue
+            if builder is None:
+                continue
+            builder.event(event, value)
+            # The value is complete once an event at its own prefix closes it
+            if prefix == key and event not in ('start_map', 'start_array', 'map_key'):
+                fields[key] = builder.value
+                builder = None
+    return fields, has_files
+ 
+ 
+def _load_pr_data(path: str) -> Tuple[Dict, bool, Iterable[Dict]]:
+    """
+    Load a PR data file as (top-level fields, whether it has `files`, file entries).
+ 
+    With ijson installed the file entries are streamed from disk one at a time, so a
+    large PR is never held in memory as a whole. Otherwise the whole file is parsed.
+    """
+    if ijson is None:
+        pr_data = _load_json(path)
+        return pr_data, "files" in pr_data, pr_data.get("files", [])
+ 
+    def iter_files():
+        with open(path, 'rb') as f:
+            yield from ijson.items(f, 'files.item', use_float=True)
+ 
+    fields, has_files = _read_pr_fields(path)
+    return fields, has_files, iter_files()
+ 
+ 
+def _write_file_jsons(entries: Iterable[Dict], modified_files_dir: str) -> None:
+    """Write one pretty-printed JSON file per modified file, mirroring the PR's paths."""
+    # The writes are independent small files, so they run on a thread pool. At most
+    # 2 * WRITE_WORKERS are in flight, which keeps streamed entries from piling up.
+    created_dirs = {""}
+    pending = deque()
+ 
+    def finish_oldest():
+        filename, file_output_path, future = pending.popleft()
+        future.result()
+        # Checked first so the message isn't even formatted per file when debug logging is off
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Saved file data for %s to: %s", filename, file_output_path)
+ 
+    with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as executor:
+        for entry in entries:
+            # Create each target directory once instead of once per file
+            file_dir = os.path.dirname(entry["filename"])
+            if file_dir not in created_dirs:
+                os.makedirs(os.path.join(modified_files_dir, file_dir), exist_ok=True)
+                created_dirs.add(file_dir)
+ 
+            file_output_path = os.path.join(modified_files_dir, f"{entry['filename']}.json")
+            pending.append((entry["filename"], file_output_path, executor.submit(_dump_json, entry, file_output_path)))
+            if len(pending) >= 2 * WRITE_WORKERS:
+                finish_oldest()
+ 
+        while pending:
+            finish_oldest()
  
  
-def split_pr_data(pr_data_file: str, output_dir: Optional[str] = None) -> str:
+def _write_file_stream(entries: Iterable[Dict], path: str, output_format: str) -> None:
+    """Write all modified files into a single JSONL or msgpack stream, one record per file."""
+    if output_format == "msgpack":
+        try:
+            import msgpack
+        except ImportError as e:
+            raise ImportError("msgpack is not installed. Install it with: pip install msgpack") from e
+        encode = msgpack.Packer().pack
+    elif orjson is not None:
+        encode = lambda entry: orjson.dumps(entry) + b"\n"
+    else:
+        encode = lambda entry: json.dumps(entry).encode("utf-8") + b"\n"
+ 
+    count = 0
+    with open(path, 'wb') as f:
+        for entry in entries:
+            f.write(encode(entry))
+            count += 1
+    print(f"Saved file data for {count} files to: {path}")
+ 
+ 
+def split_pr_data(pr_data_file: str, output_dir: Optional[str] = None, output_format: str = "json") -> str:
     print(f"Processing PR data file: {pr_data_file}")
-    with open(pr_data_file, 'r') as f:
-        pr_data = json.load(f)
+    pr_data, has_files, files = _load_pr_data(pr_data_file)
  
     pr_number = pr_data.get('pr_number')
     if not pr_number:
         raise ValueError("PR data must contain a 'pr_number' field")
  
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+ 
     # Determine output directory
     if not output_dir:
         output_dir = os.path.join(os.path.dirname(pr_data_file), f"pr_{pr_number}_split")
  
     os.makedirs(output_dir, exist_ok=True)
     modified_files_dir = os.path.join(output_dir, "modified_files")
-    os.makedirs(modified_files_dir, exist_ok=True)
+    if output_format == "json":
+        os.makedirs(modified_files_dir, exist_ok=True)
  
     print(f"Created output directory: {output_dir}")
  
+    # Process modified files, collecting their summaries for the metadata as they stream by
+    file_summaries = []
+ 
+    def file_entries():
+        for file_data in files:
+            summary = file_data.get("summary", {})
+            status = summary.get("status", file_data.get("status"))
+            additions = summary.get("additions", file_data.get("additions", 0))
+            deletions = summary.get("deletions", file_data.get("deletions", 0))
+            file_summaries.append({
+                "filename": file_data.get("filename"),
+                "status": status,
+                "additions": additions,
+                "deletions": deletions
+            })
+ 
+            filename = file_data.get("filename")
+            if not filename:
+                continue
+            yield {
+                "filename": filename,
+                "status": status,
+                "additions": additions,
+                "deletions": deletions,
+                "total_changes": additions + deletions,
+                "diff_chunks": file_data.get("diff_chunks", []),
+                "full_diff": file_data.get("full_diff", file_data.get("diff", ""))
+            }
+ 
+    if output_format == "json":
+        _write_file_jsons(file_entries(), modified_files_dir)
+    else:
+        _write_file_stream(file_entries(), os.path.join(output_dir, f"modified_files.{output_format}"), output_format)
+ 
     # Extract PR metadata
     pr_metadata = {
         "pr_number": pr_data.get("pr_number"),
@@ -47,64 +228,23 @@ def split_pr_data(pr_data_file: str, output_dir: Optional[str] = None) -> str:
         "comments": pr_data.get("comments", []),
         "reviews": pr_data.get("reviews", [])
     }
- 
-    # Add file summary information
-    file_summaries = []
-    if "files" in pr_data:
-        for file_data in pr_data["files"]:
-            summary = file_data.get("summary", {})
-            file_summaries.append({
-                "filename": file_data.get("filename"),
-                "status": summary.get("status", file_data.get("status")),
-                "additions": summary.get("additions", file_data.get("additions", 0)),
-                "deletions": summary.get("deletions", file_data.get("deletions", 0))
-            })
+    if has_files:
         pr_metadata["changed_files"] = file_summaries
  
     metadata_file = os.path.join(output_dir, "pr_metadata.json")
-    with open(metadata_file, 'w') as f:
-        json.dump(pr_metadata, f, indent=2)
+    _dump_json(pr_metadata, metadata_file)
  
     print(f"Saved PR metadata to: {metadata_file}")
  
-    # Process modified files
-    for file_data in pr_data.get("files", []):
-        filename = file_data.get("filename")
-        if not filename:
-            continue
- 
-        summary = file_data.get("summary", {})
-        file_json = {
-            "filename": filename,
-            "status": summary.get("status", file_data.get("status")),
-            "additions": summary.get("additions", file_data.get("additions", 0)),
-            "deletions": summary.get("deletions", file_data.get("deletions", 0)),
-            "total_changes": summary.get("additions", file_data.get("additions", 0)) +
-                             summary.get("deletions", file_data.get("deletions", 0)),
-            "diff_chunks": file_data.get("diff_chunks", []),
-            "full_diff": file_data.get("full_diff", file_data.get("diff", ""))
-        }
- 
-        file_dir = os.path.dirname(filename)
-        target_dir = os.path.join(modified_files_dir, file_dir)
-        if file_dir:
-            os.makedirs(target_dir, exist_ok=True)
- 
-        json_filename = f"{os.path.basename(filename)}.json"
-        file_output_path = os.path.join(target_dir, json_filename)
- 
-        with open(file_output_path, 'w') as f:
-            json.dump(file_json, f, indent=2)
- 
-        print(f"Saved file data for {filename} to: {file_output_path}")
- 
     print(f"Successfully split PR data into: {output_dir}")
     return output_dir
  
  
-def process_pr_directory(directory: str) -> None:
+def process_pr_directory(directory: str, output_format: str = "json") -> None:
     print(f"Processing PR data files in directory: {directory}")
-    json_files = [f for f in os.listdir(directory) if f.endswith('.json') and os.path.isfile(os.path.join(directory, f))]
+    # scandir entries carry their file type, so no extra stat per entry is needed
+    with os.scandir(directory) as entries:
+        json_files = [entry.name for entry in entries if PR_DATA_FILE_RE.search(entry.name) and entry.is_file()]
  
     if not json_files:
         print(f"No JSON files found in {directory}")
@@ -113,7 +253,7 @@ def process_pr_directory(directory: str) -> None:
     print(f"Found {len(json_files)} JSON files")
     for json_file in json_files:
         try:
-            split_pr_data(os.path.join(directory, json_file))
+            split_pr_data(os.path.join(directory, json_file), output_format=output_format)
         except Exception as e:
             print(f"Error processing {json_file}: {e}")
  
@@ -122,11 +262,15 @@ def process_pr_directory(directory: str) -> None:
  
  
 def main():
+    # Per-file messages are logged at DEBUG; run with LOG_LEVEL=DEBUG to see them
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(message)s")
     parser = argparse.ArgumentParser(description='Split PR data JSON files into separate files')
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument('--file', '-f', type=str, help='Path to a single PR data JSON file')
     group.add_argument('--directory', '-d', type=str, help='Directory containing PR data JSON files')
     parser.add_argument('--output', '-o', type=str, help='Optional output directory path')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='json',
+                        help='Per-file JSON files (default) or a single JSONL/msgpack stream')
     args = parser.parse_args()
  
     try:
@@ -134,13 +278,13 @@ def main():
             if not os.path.isfile(args.file):
                 print(f"Error: File {args.file} does not exist")
                 sys.exit(1)
-            split_pr_data(args.file, args.output)
+            split_pr_data(args.file, args.output, args.format)
  
         elif args.directory:
             if not os.path.isdir(args.directory):
                 print(f"Error: Directory {args.directory} does not exist")
                 sys.exit(1)
-            process_pr_directory(args.directory)
+            process_pr_directory(args.directory, args.format)
  
     except Exception as e:
         print(f"Error: {e}")
@@ -1,14 +1,31 @@
+import asyncio
+import hashlib
+import json
+import logging
 import os
+import re
+import sqlite3
+import time
+from collections import OrderedDict, deque
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from dotenv import load_dotenv
+import threading
 import uuid
 
 import chromadb
-from llama_index.core import Settings, StorageContext, load_index_from_storage, VectorStoreIndex, PromptTemplate
+import numpy as np
+from llama_index.core import Settings, VectorStoreIndex, PromptTemplate
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.embeddings import BaseEmbedding
+from llama_index.core.vector_stores.types import (
+    FilterOperator, MetadataFilter, MetadataFilters
+)
 from llama_index.vector_stores.chroma import ChromaVectorStore
 from llama_index.core.agent import ReActAgent
-from llama_index.core.tools import QueryEngineTool, ToolMetadata, FunctionTool
+from llama_index.core.agent.react.formatter import ReActChatFormatter
+from llama_index.core.tools import FunctionTool
 from llama_index.llms.openai import OpenAI
 from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.core.response_synthesizers import get_response_synthesizer
@@ -17,30 +34,431 @@ from llama_index.core.callbacks.simple_llm_handler import SimpleLLMHandler
 
 from .prompts import SYSTEM_PROMPT_CO_REVIEWER, SYSTEM_PROMPT_INTERACTIVE_ASSISTANT
 from .review_tool import create_review_tool
-from .model_constants import OPENAI_LLM_MODEL, OPENAI_EMBEDDING_MODEL
+from .model_constants import OPENAI_LLM_MODEL, OPENAI_EMBEDDING_MODEL, OPENAI_EMBEDDING_DIMS
+
+logger = logging.getLogger(__name__)
 
 # --- Settings ---
 # Load environment variables from .env file
 load_dotenv()
 
-# Check if API key is available and print a message (without showing the key)
-if "OPENAI_API_KEY" in os.environ:
-    print("✅ OPENAI_API_KEY environment variable is set.")
-else:
-    print("❌ OPENAI_API_KEY environment variable is NOT set. Please check your .env file.")
+# Set AGENT_VERBOSE=1 to print the agents' reasoning steps and the query engines' retrieved nodes
+AGENT_VERBOSE = os.getenv("AGENT_VERBOSE", "0") == "1"
+
+# Written by scripts/index_data.py into each collection's metadata; collections embedded
+# with another model or size must be reindexed before the agent can query them
+EMBEDDING_SIGNATURE = f"{OPENAI_EMBEDDING_MODEL}:{OPENAI_EMBEDDING_DIMS}"
+
+# Query/text embeddings kept in memory; the agent repeats the same tool queries across turns and sessions
+EMBEDDING_CACHE_SIZE = 10_000
 
-Settings.llm = OpenAI(model=OPENAI_LLM_MODEL, temperature=0.0)
-Settings.embed_model = OpenAIEmbedding(model=OPENAI_EMBEDDING_MODEL)
+class _MemoizedEmbedding(BaseEmbedding):
+    """Wraps an embedding model with an in-process LRU cache, so repeated texts aren't embedded again."""
+    
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _cache: OrderedDict = PrivateAttr()
+    _cache_lock: threading.Lock = PrivateAttr()
+    
+    def __init__(self, embed_model: BaseEmbedding, **kwargs):
+        super().__init__(
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+            **kwargs
+        )
+        self._embed_model = embed_model
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+    
+    @classmethod
+    def class_name(cls) -> str:
+        return "MemoizedEmbedding"
+    
+    def _key(self, kind: str, text: str) -> bytes:
+        dimensions = getattr(self._embed_model, "dimensions", None)
+        return hashlib.sha256(f"{self.model_name}\0{dimensions}\0{kind}\0{text}".encode("utf-8")).digest()
+    
+    def _lookup(self, key: bytes) -> Optional[List[float]]:
+        with self._cache_lock:
+            embedding = self._cache.get(key)
+            if embedding is not None:
+                self._cache.move_to_end(key)
+            return embedding
+    
+    def _store(self, key: bytes, embedding: List[float]):
+        with self._cache_lock:
+            self._cache[key] = embedding
+            if len(self._cache) > EMBEDDING_CACHE_SIZE:
+                self._cache.popitem(last=False)
+    
+    def _get_query_embedding(self, query: str) -> List[float]:
+        key = self._key("query", query)
+        embedding = self._lookup(key)
+        if embedding is None:
+            embedding = self._embed_model.get_query_embedding(query)
+            self._store(key, embedding)
+        return embedding
+    
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        key = self._key("query", query)
+        embedding = self._lookup(key)
+        if embedding is None:
+            embedding = await self._embed_model.aget_query_embedding(query)
+            self._store(key, embedding)
+        return embedding
+    
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+    
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key("text", text) for text in texts]
+        embeddings = [self._lookup(key) for key in keys]
+        misses = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if misses:
+            # Only the texts not seen before reach the model, in a single batch
+            for i, embedding in zip(misses, self._embed_model.get_text_embedding_batch([texts[i] for i in misses])):
+                embeddings[i] = embedding
+                self._store(keys[i], embedding)
+        return embeddings
+
+@lru_cache(maxsize=None)
+def _ensure_settings():
+    """Configures the global LLM and embedding model on first use instead of at import time."""
+    # Check if API key is available and print a message (without showing the key)
+    if "OPENAI_API_KEY" in os.environ:
+        print("✅ OPENAI_API_KEY environment variable is set.")
+    else:
+        print("❌ OPENAI_API_KEY environment variable is NOT set. Please check your .env file.")
+    
+    Settings.llm = OpenAI(model=OPENAI_LLM_MODEL, temperature=0.0)
+    Settings.embed_model = _MemoizedEmbedding(
+        OpenAIEmbedding(model=OPENAI_EMBEDDING_MODEL, dimensions=OPENAI_EMBEDDING_DIMS)
+    )
 
 # --- Index Loading ---
-def load_query_engine_tools(pr_id: str) -> List[QueryEngineTool]:
+# Set USE_FAISS=1 to serve collections of up to FAISS_MAX_CHUNKS chunks from an in-memory FAISS index
+# (pip install faiss-cpu llama-index-vector-stores-faiss); larger collections stay on Chroma
+USE_FAISS = os.getenv("USE_FAISS", "0") == "1"
+FAISS_MAX_CHUNKS = 100_000
+# Set USE_SEMANTIC_CACHE=1 to answer a tool query from an earlier answer of the same tool when the
+# queries' embeddings have at least SEMANTIC_CACHE_THRESHOLD cosine similarity. Off by default:
+# queries that differ only in a file name can embed almost identically
+USE_SEMANTIC_CACHE = os.getenv("USE_SEMANTIC_CACHE", "0") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_SIZE = 256
+SEMANTIC_CACHE_TTL = 3600  # seconds
+# Set WARMUP_TOOLS=1 to load every tool's index in a background thread as soon as a PR's tools are
+# created, instead of on each tool's first call
+WARMUP_TOOLS = os.getenv("WARMUP_TOOLS", "0") == "1"
+
+# Indexes written by scripts/index_data.py and the data they were built from, relative to the working directory
+INDEXES_ROOT = Path("indexes")
+DATA_ROOT = Path("data")
+
+@lru_cache(maxsize=16)
+def _index_paths(pr_id: str) -> Tuple[Path, str]:
+    """Returns the index directory of a PR, both as a Path and as the string the ChromaDB helpers are keyed by."""
+    index_dir = INDEXES_ROOT / pr_id
+    return index_dir, str(index_dir)
+
+@lru_cache(maxsize=8)
+def _get_chroma_client(path: str):
+    """Returns the ChromaDB client for an index directory, reusing it across agents and tools."""
+    return chromadb.PersistentClient(path=path)
+
+# (index directory, collection name) -> (item count, time it was counted), filled in by the tools
+_collection_counts: Dict[Tuple[str, str], Tuple[int, float]] = {}
+
+@lru_cache(maxsize=32)
+def _get_collection(path: str, name: str):
+    """Returns a ChromaDB collection from the cached client of its index directory."""
+    return _get_chroma_client(path).get_collection(name)
+
+def _load_faiss_index(collection) -> VectorStoreIndex:
+    """Copies a ChromaDB collection into an exact (flat inner product) FAISS index held in memory."""
+    import faiss
+    from llama_index.core import StorageContext
+    from llama_index.core.vector_stores.utils import metadata_dict_to_node
+    from llama_index.vector_stores.faiss import FaissVectorStore
+    
+    rows = collection.get(include=["embeddings", "documents", "metadatas"])
+    vectors = np.asarray(rows["embeddings"], dtype="float32")
+    # Inner product on unit vectors is the cosine similarity (OpenAI query embeddings are already unit length)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    
+    nodes = []
+    for vector, text, metadata in zip(vectors, rows["documents"], rows["metadatas"]):
+        node = metadata_dict_to_node(metadata, text=text)
+        node.embedding = vector.tolist()
+        nodes.append(node)
+    
+    vector_store = FaissVectorStore(faiss_index=faiss.IndexFlatIP(vectors.shape[1]))
+    storage_context = StorageContext.from_defaults(vector_store=vector_store)
+    # The nodes carry their embeddings, so nothing is sent to the embedding model
+    return VectorStoreIndex(nodes, storage_context=storage_context)
+
+# Path-like tokens in a query, e.g. 'src/app/main.py' or "utils.py"
+_FILE_TOKEN_RE = re.compile(r"[\w.\-/]+\.\w+")
+# Queries matching more changed files than this are answered by plain similarity search
+MAX_ROUTED_FILES = 5
+
+def _changed_file_paths(pr_data_dir: Path) -> Dict[str, str]:
+    """Maps each changed file of a PR to the file_path its split JSON was indexed under.
+    
+    Read from the pr_metadata.json files scripts/split_pr_data.py writes in the PR data folder (or a
+    split directory in it), e.g. 'a/b/c.py' as 'pr_7_split/modified_files/a/b/c.py.json'.
+    """
+    file_paths = {}
+    for metadata_path in [*pr_data_dir.glob("pr_metadata.json"), *pr_data_dir.glob("*/pr_metadata.json")]:
+        try:
+            with open(metadata_path, "r", encoding="utf-8") as f:
+                changed_files = json.load(f).get("changed_files") or []
+        except (OSError, ValueError) as e:
+            logger.warning("Could not read %s: %s", metadata_path, e)
+            continue
+        modified_files_dir = metadata_path.parent.relative_to(pr_data_dir) / "modified_files"
+        for changed_file in changed_files:
+            if changed_file.get("filename"):
+                file_paths[changed_file["filename"]] = str(modified_files_dir / f"{changed_file['filename']}.json")
+    return file_paths
+
+class _FileRoutedQueryEngine:
+    """Answers queries that name changed files from those files' chunks only, via a file_path filter.
+    
+    Other queries, and routed ones that find no chunks (e.g. a file too large to index), go to
+    the unfiltered query engine.
+    """
+    
+    def __init__(self, index: VectorStoreIndex, query_engine, engine_kwargs: Dict, file_paths: Dict[str, str]):
+        self._index = index
+        self._query_engine = query_engine
+        self._engine_kwargs = engine_kwargs
+        self._file_paths = file_paths
+    
+    def _engine_for(self, query_str: str):
+        matched = set()
+        for token in _FILE_TOKEN_RE.findall(query_str):
+            token = token.strip("./")
+            # A full path, or a trailing part of one (e.g. just the file name)
+            matched.update(
+                indexed_path for changed_path, indexed_path in self._file_paths.items()
+                if changed_path == token or changed_path.endswith("/" + token)
+            )
+        if not matched or len(matched) > MAX_ROUTED_FILES:
+            return self._query_engine
+        
+        logger.debug("Routing query to files: %s", sorted(matched))
+        filters = MetadataFilters(filters=[
+            MetadataFilter(key="file_path", value=sorted(matched), operator=FilterOperator.IN)
+        ])
+        return self._index.as_query_engine(filters=filters, **self._engine_kwargs)
+    
+    def query(self, query_str: str):
+        engine = self._engine_for(query_str)
+        response = engine.query(query_str)
+        if engine is not self._query_engine and not response.source_nodes:
+            response = self._query_engine.query(query_str)
+        return response
+    
+    async def aquery(self, query_str: str):
+        engine = self._engine_for(query_str)
+        response = await engine.aquery(query_str)
+        if engine is not self._query_engine and not response.source_nodes:
+            response = await self._query_engine.aquery(query_str)
+        return response
+
+def _build_query_engine(config: Dict, collection, count: int):
+    """Builds the query engine of a tool from its (non-empty) ChromaDB collection of `count` items."""
+    index = None
+    if USE_FAISS and count <= FAISS_MAX_CHUNKS:
+        try:
+            index = _load_faiss_index(collection)
+            logger.debug("Loaded %s into a FAISS index", config["collection_name"])
+        except ImportError as e:
+            logger.warning("FAISS is not installed (%s), using ChromaDB for %s", e, config["collection_name"])
+    
+    if index is None:
+        # Create a vector store using the collection
+        vector_store = ChromaVectorStore(chroma_collection=collection)
+        
+        # Chroma stores the chunk texts, so the index is loaded from it directly
+        index = VectorStoreIndex.from_vector_store(vector_store)
+    
+    # Get appropriate parameters based on collection type
+    similarity_top_k = 5  # Retrieve more results for better context
+    
+    # For PR data (JSON), adjust query parameters to better handle structured data, with a filter-capable query engine
+    if "pr_data" in config["collection_name"]:
+        # Create a custom response synthesizer for PR data
+        response_synthesizer = get_response_synthesizer(
+            # Compact packs the retrieved diff chunks into as few LLM calls as fit the context
+            # window, where refine made one sequential call per chunk
+            response_mode="compact",
+            verbose=AGENT_VERBOSE,
+        )
+        
+        # Create a query engine with custom parameters for PR data
+        engine_kwargs = dict(
+            similarity_top_k=similarity_top_k,
+            response_synthesizer=response_synthesizer,
+            verbose=AGENT_VERBOSE
+        )
+        query_engine = index.as_query_engine(filters=None, **engine_kwargs)
+        # The FAISS store can't filter on metadata, so only Chroma-backed indexes route by file
+        if isinstance(index.vector_store, ChromaVectorStore):
+            query_engine = _FileRoutedQueryEngine(index, query_engine, engine_kwargs, _changed_file_paths(config["data_dir"]))
+        logger.debug("Created PR-data specific query engine for %s", config["name"])
+    else:
+        # For code and requirements, use tree_summarize which works better for code/text
+        query_engine = index.as_query_engine(
+            similarity_top_k=similarity_top_k,
+            streaming=False,
+            response_mode="tree_summarize",
+            # Summarizes the retrieved chunks concurrently when they don't fit in one LLM call
+            use_async=True,
+            verbose=AGENT_VERBOSE
+        )
+    
+    logger.debug("Successfully created query engine for %s", config["name"])
+    return query_engine
+
+class _SemanticCache:
+    """Recent answers of a tool, returned again for queries whose embedding is close to an earlier one."""
+    
+    def __init__(self, maxsize: int, threshold: float, ttl: float):
+        self.threshold = threshold
+        self.ttl = ttl
+        # (unit-length query embedding, answer, time added), oldest first
+        self._entries = deque(maxlen=maxsize)
+        self._lock = threading.Lock()
+    
+    def lookup(self, embedding: List[float]) -> Optional[str]:
+        query = _unit_vector(embedding)
+        now = time.time()
+        with self._lock:
+            while self._entries and now - self._entries[0][2] > self.ttl:
+                self._entries.popleft()
+            if not self._entries:
+                return None
+            similarities = np.stack([vector for vector, _, _ in self._entries]) @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                return self._entries[best][1]
+        return None
+    
+    def add(self, embedding: List[float], answer: str):
+        with self._lock:
+            self._entries.append((_unit_vector(embedding), answer, time.time()))
+
+def _unit_vector(embedding: List[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype="float32")
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+def _make_lazy_query_fns(config: Dict, path: str):
+    """Returns the sync and async functions behind a tool, which load the tool's index on its first call only.
+    
+    The agent usually calls just one or two of its tools per session, so the others never touch disk.
+    """
+    lock = threading.Lock()
+    query_engine = None
+    # Returned instead of an answer when the collection can't be queried
+    unavailable_message = None
+    semantic_cache = _SemanticCache(SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_TTL)
+    
+    def load():
+        """Returns the tool's query engine, or None if its collection is empty or needs reindexing."""
+        nonlocal query_engine, unavailable_message
+        with lock:
+            if query_engine is None and unavailable_message is None:
+                collection = _get_collection(path, config["collection_name"])
+                logger.debug("Loaded ChromaDB collection: %s", config["collection_name"])
+                
+                # Vectors of another model or size can't be compared with the agent's query embeddings
+                signature = (collection.metadata or {}).get("embedding")
+                if signature != EMBEDDING_SIGNATURE:
+                    logger.error("Collection %s was embedded with %s, expected %s.", config["collection_name"], signature, EMBEDDING_SIGNATURE)
+                    unavailable_message = (
+                        f"The {config['name']} collection ({config['collection_name']}) was indexed with "
+                        f"{signature or 'an older embedding model'} but the agent uses {EMBEDDING_SIGNATURE}. "
+                        "Reindex required: run scripts/index_data.py with FORCE_REINDEX=true."
+                    )
+                    return None
+                
+                # Check if the collection has any items
+                count = collection.count()
+                _collection_counts[(path, config["collection_name"])] = (count, time.time())
+                if count == 0:
+                    logger.warning("Collection %s is empty.", config["collection_name"])
+                    unavailable_message = f"The {config['name']} collection ({config['collection_name']}) is empty. No data is available for this tool."
+                else:
+                    logger.debug("Collection %s has %d items.", config["collection_name"], count)
+                    query_engine = _build_query_engine(config, collection, count)
+        return query_engine
+    
+    def query(input: str) -> str:
+        engine = load()
+        if engine is None:
+            return unavailable_message
+        
+        if not USE_SEMANTIC_CACHE:
+            return str(engine.query(input))
+        
+        embedding = Settings.embed_model.get_query_embedding(input)
+        answer = semantic_cache.lookup(embedding)
+        if answer is None:
+            answer = str(engine.query(input))
+            semantic_cache.add(embedding, answer)
+        else:
+            logger.debug("Semantic cache hit for %s: %s", config["name"], input)
+        return answer
+    
+    async def aquery(input: str) -> str:
+        # Loading reads from disk, so it runs off the event loop; the query itself is awaited
+        engine = query_engine if query_engine is not None else await asyncio.to_thread(load)
+        if engine is None:
+            return unavailable_message
+        
+        if not USE_SEMANTIC_CACHE:
+            return str(await engine.aquery(input))
+        
+        embedding = await Settings.embed_model.aget_query_embedding(input)
+        answer = semantic_cache.lookup(embedding)
+        if answer is None:
+            answer = str(await engine.aquery(input))
+            semantic_cache.add(embedding, answer)
+        else:
+            logger.debug("Semantic cache hit for %s: %s", config["name"], input)
+        return answer
+    
+    def warmup():
+        """Loads the query engine and runs one retrieval, so the first real query doesn't pay for the cold store."""
+        try:
+            if load() is not None:
+                # A fixed unit vector, so warming up needs no embedding request
+                probe = [1.0] + [0.0] * (OPENAI_EMBEDDING_DIMS - 1)
+                _get_collection(path, config["collection_name"]).query(query_embeddings=[probe], n_results=1)
+                logger.debug("Warmed up %s", config["name"])
+        except Exception as e:
+            logger.warning("Warm-up of %s failed: %s", config["name"], e)
+    
+    return query, aquery, warmup
+
+# pr_id -> tools built by load_query_engine_tools
+_tools_by_pr: Dict[str, List[FunctionTool]] = {}
+
+def load_query_engine_tools(pr_id: str) -> List[FunctionTool]:
     """Loads query engines for the specified PR ID and returns them as tools.
     
     This loads indexed data from the ChromaDB collections created by scripts/index_data.py.
     The PR ID (e.g., 'project_1', 'project_2') corresponds to directory names under 'indexes/'.
     """
+    _ensure_settings()
     
-    index_dir = Path("indexes") / pr_id
+    # The tools of a PR (and the query engines they load) are shared by all its sessions
+    cached_tools = _tools_by_pr.get(pr_id)
+    if cached_tools is not None:
+        return list(cached_tools)
+    
+    index_dir, index_path = _index_paths(pr_id)
     query_engine_tools = []
     
     if not index_dir.exists():
@@ -50,9 +468,10 @@ def load_query_engine_tools(pr_id: str) -> List[QueryEngineTool]:
     # Collection/Storage mapping - adjust these mappings as needed
     tool_configs: List[Dict] = [
         {
-            "storage_dir": "storage_pr_data",
             "name": "search_pr",
             "collection_name": f"{pr_id}_pr_data",
+            # Holds the split PR data, whose pr_metadata.json lists the changed files to route queries by
+            "data_dir": DATA_ROOT / pr_id / "pr_data",
             "description": """Provides detailed information about file diffs, changes, modifications and other information about the PR being reviewed. This is THE ONLY tool that can answer questions about code changes in the PR.
 **When to use:**  
 - Queries about specific diffs or code changes
@@ -73,7 +492,6 @@ Retrieves data from structured PR files:
 - This tool only shows the parts of the files that were changed. not the complete file""",
         },
         {
-            "storage_dir": "storage_source_code", 
             "name": "search_code",
             "collection_name": f"{pr_id}_source_code",
             "description": """Searches the INITIAL STATE of the code before all changes. It contains the whole codebase, not just the files affected in the PR.
@@ -90,7 +508,6 @@ Retrieves data from structured PR files:
 - The source code is large and the tool may not return all relevant data.""",
         },
         {
-            "storage_dir": "storage_pr_feature",
             "name": "search_requirements",
             "collection_name": f"{pr_id}_pr_feature", 
             "description": """earches information regarding the feature being implemented in the PR. 
@@ -107,86 +524,27 @@ Retrieves data from structured PR files:
 
     try:
         # Initialize ChromaDB client for this project
-        print(f"Initializing ChromaDB client from: {index_dir}")
-        chroma_client = chromadb.PersistentClient(path=str(index_dir))
+        logger.debug("Initializing ChromaDB client from: %s", index_dir)
+        _get_chroma_client(index_path)
     except Exception as e:
         print(f"Error initializing ChromaDB client for {pr_id}: {e}")
         return []
     
+    warmups = []
     for config in tool_configs:
-        storage_path = index_dir / config["storage_dir"]
-        
         try:
-            # Get the ChromaDB collection
-            collection = chroma_client.get_collection(config["collection_name"])
-            print(f"Loaded ChromaDB collection: {config['collection_name']}")
-            
-            # Check if the collection has any items
-            if collection.count() == 0:
-                print(f"Warning: Collection {config['collection_name']} is empty. Creating a simple tool that reports this.")
-                # Create a function that always returns a specific response about the collection being empty
-                def empty_collection_func(input_text: str) -> str:
-                    return f"The {config['name']} collection ({config['collection_name']}) is empty. No data is available for this tool."
-                
-                tool = FunctionTool.from_defaults(
-                    name=config["name"],
-                    description=config["description"],
-                    fn=empty_collection_func
-                )
-            else:
-                print(f"Collection {config['collection_name']} has {collection.count()} items.")
-                # Create a vector store using the collection
-                vector_store = ChromaVectorStore(chroma_collection=collection)
-                
-                # Create a storage context with the vector store and the storage directory
-                storage_context = StorageContext.from_defaults(
-                    vector_store=vector_store,
-                    persist_dir=str(storage_path)
-                )
-                
-                # Load the index from storage
-                index = load_index_from_storage(storage_context)
-                
-                # Get appropriate parameters based on collection type
-                similarity_top_k = 5  # Retrieve more results for better context
-                
-                # For PR data (JSON), adjust query parameters to better handle structured data, with a filter-capable query engine
-                if "pr_data" in config["collection_name"]:
-                    # Create a custom response synthesizer for PR data
-                    response_synthesizer = get_response_synthesizer(
-                        response_mode="refine",  # Use refine mode for structured data
-                        verbose=True,
-                    )
-                    
-                    # Create a query engine with custom parameters for PR data
-                    query_engine = index.as_query_engine(
-                        similarity_top_k=similarity_top_k,
-                        response_synthesizer=response_synthesizer,
-                        filters=None,  # We'll set this dynamically based on the query
-                        verbose=True
-                    )
-                    print(f"Created PR-data specific query engine for {config['name']}")
-                else:
-                    # For code and requirements, use tree_summarize which works better for code/text
-                    query_engine = index.as_query_engine(
-                        similarity_top_k=similarity_top_k,
-                        streaming=False,
-                        response_mode="tree_summarize",
-                        verbose=True
-                    )
-                
-                print(f"Successfully created query engine for {config['name']}")
-                
-                # Create the tool
-                tool = QueryEngineTool(
-                    query_engine=query_engine,
-                    metadata=ToolMetadata(
-                        name=config["name"],
-                        description=config["description"],
-                    ),
-                )
-            
+            # Fetching the collection handle is cheap and drops tools whose collection is
+            # missing; the index itself is only loaded on the tool's first call
+            _get_collection(index_path, config["collection_name"])
+            query_fn, async_query_fn, warmup = _make_lazy_query_fns(config, index_path)
+            tool = FunctionTool.from_defaults(
+                name=config["name"],
+                description=config["description"],
+                fn=query_fn,
+                async_fn=async_query_fn,
+            )
             query_engine_tools.append(tool)
+            warmups.append(warmup)
             
         except Exception as e:
             print(f"Error loading tool {config['name']} for {pr_id}: {e}")
@@ -194,135 +552,208 @@ Retrieves data from structured PR files:
     
     if not query_engine_tools:
         print(f"Error: No query engine tools could be loaded for pr_id: {pr_id}")
+        return query_engine_tools
     
-    return query_engine_tools
+    _tools_by_pr[pr_id] = query_engine_tools
+    if WARMUP_TOOLS:
+        # In the background, so agent creation doesn't wait for it
+        threading.Thread(target=lambda: [warmup() for warmup in warmups], daemon=True).start()
+    # Callers get their own list, since create_agent appends its per-session tools to it
+    return list(query_engine_tools)
 
 
 # --- Agent Creation ---
+# Set DEBUG_TOOLS=1 to give agents a debug_info tool reporting on the PR's raw collections
+DEBUG_TOOLS = os.getenv("DEBUG_TOOLS", "0") == "1"
+# Reasoning steps (each a full LLM call) an agent may take per user message
+AGENT_MAX_ITERATIONS = int(os.getenv("AGENT_MAX_ITERATIONS", "6"))
+
+# System prompt per interaction mode; the formatters and templates built from them are shared by all agents
+_MODE_SYSTEM_PROMPTS = {
+    "co_reviewer": SYSTEM_PROMPT_CO_REVIEWER,
+    "interactive_assistant": SYSTEM_PROMPT_INTERACTIVE_ASSISTANT,
+}
+_MODE_FORMATTERS = {
+    mode: ReActChatFormatter.from_defaults(system_header=prompt) for mode, prompt in _MODE_SYSTEM_PROMPTS.items()
+}
+_MODE_PROMPT_TEMPLATES = {mode: PromptTemplate(prompt) for mode, prompt in _MODE_SYSTEM_PROMPTS.items()}
+
+# Distinct tool calls a repeat guard remembers within one user turn
+REPEAT_GUARD_SIZE = 32
+
+class _RepeatGuard:
+    """Remembers the tool answers of the current user turn, so repeating a call returns the earlier answer.
+    
+    Agents tend to re-issue the same tool query while reasoning about one message; the note added
+    to the repeated answer tells the agent to move on. The answers are cleared at the start of each
+    turn, so a question the user asks again is answered afresh.
+    """
+    
+    def __init__(self, maxsize: int):
+        self._maxsize = maxsize
+        self._answers: OrderedDict = OrderedDict()
+    
+    def reset(self):
+        self._answers.clear()
+    
+    def _repeated(self, name: str, input: str) -> Optional[str]:
+        answer = self._answers.get((name, input.strip()))
+        if answer is None:
+            return None
+        logger.debug("Repeated %s call: %s", name, input)
+        return f"(Duplicate call: you already ran {name} with this input. Use the earlier result, repeated here.)\n{answer}"
+    
+    def _remember(self, name: str, input: str, answer: str):
+        self._answers[(name, input.strip())] = answer
+        if len(self._answers) > self._maxsize:
+            self._answers.popitem(last=False)
+    
+    def wrap(self, tool: FunctionTool) -> FunctionTool:
+        """Returns the tool with repeated calls in a turn answered from memory."""
+        name = tool.metadata.name
+        
+        def call(input: str) -> str:
+            answer = self._repeated(name, input)
+            if answer is None:
+                answer = tool.call(input=input).content
+                self._remember(name, input, answer)
+            return answer
+        
+        async def acall(input: str) -> str:
+            answer = self._repeated(name, input)
+            if answer is None:
+                answer = (await tool.acall(input=input)).content
+                self._remember(name, input, answer)
+            return answer
+        
+        return FunctionTool.from_defaults(
+            name=name,
+            description=tool.metadata.description,
+            fn=call,
+            async_fn=acall,
+        )
+
+class _TurnScopedReActAgent(ReActAgent):
+    """ReActAgent that starts every chat turn with an empty repeat guard."""
+    
+    _repeat_guard: Optional[_RepeatGuard] = None
+    
+    def chat(self, *args, **kwargs):
+        if self._repeat_guard is not None:
+            self._repeat_guard.reset()
+        return super().chat(*args, **kwargs)
+    
+    async def achat(self, *args, **kwargs):
+        if self._repeat_guard is not None:
+            self._repeat_guard.reset()
+        return await super().achat(*args, **kwargs)
 
 def create_agent(pr_id: str, mode: str) -> ReActAgent:
     """Creates a ReActAgent for the given PR ID and interaction mode."""
-    query_engine_tools = load_query_engine_tools(pr_id)
+    _ensure_settings()
+    # Each session gets its own repeat guard around the shared tools
+    repeat_guard = _RepeatGuard(REPEAT_GUARD_SIZE)
+    query_engine_tools = [repeat_guard.wrap(tool) for tool in load_query_engine_tools(pr_id)]
 
     # Check if any tools were loaded successfully
     if not query_engine_tools:
          print(f"Failed to create agent for pr_id {pr_id} as no tools were loaded.")
          return None
 
-    # Add a debug tool that will help us see what's happening with the query engines
-    def debug_tools(input_text: str) -> str:
-        """Debug function to report on available tools and their raw collections."""
-        response = f"Debug report for pr_id {pr_id}:\n"
-        response += f"Number of tools available: {len(query_engine_tools)}\n"
-        
-        tool_names = [tool.metadata.name for tool in query_engine_tools]
-        response += f"Tool names: {tool_names}\n"
-        
-        try:
-            # Try to access the ChromaDB collections directly for debugging
-            index_dir = Path("indexes") / pr_id
-            client = chromadb.PersistentClient(path=str(index_dir))
-            
-            response += "\nCollection information:\n"
-            for collection in client.list_collections():
-                count = collection.count()
-                response += f"- {collection.name}: {count} items\n"
-                
-                # If there are items, sample a few
-                if count > 0:
-                    try:
-                        # Get a more substantial sample from PR data collection
-                        if "pr_data" in collection.name and count > 0:
-                            response += f"\n*** DETAILED PR DATA ANALYSIS ***\n"
-                            sample = collection.get(limit=3)
-                            
-                            # Display document IDs and metadata
-                            response += f"  Sample documents:\n"
-                            for i, doc_id in enumerate(sample['ids']):
-                                response += f"  Doc {i+1} ID: {doc_id}\n"
-                                if sample['metadatas'][i]:
-                                    response += f"  Metadata: {sample['metadatas'][i]}\n"
-                                
-                                # Show document text snippets (first 200 chars)
-                                doc_text = sample['documents'][i]
-                                if doc_text:
-                                    snippet = doc_text[:300] + "..." if len(doc_text) > 300 else doc_text
-                                    response += f"  Content snippet: {snippet}\n\n"
-                            
-                            # Try to identify fields related to file changes
-                            response += "\n  Looking for file diff related fields in documents...\n"
-                            change_related_terms = ["diff", "file", "change", "add", "remove", "modif", "patch"]
-                            for term in change_related_terms:
-                                for doc in sample['documents']:
-                                    if term in doc.lower():
-                                        context = doc[max(0, doc.lower().find(term) - 50):min(len(doc), doc.lower().find(term) + 150)]
-                                        response += f"  Found '{term}' context: '...{context}...'\n"
-                        else:
-                            # Regular sample for other collections
-                            sample = collection.get(limit=2)
-                            response += f"  Sample metadata: {sample['metadatas']}\n"
-                    except Exception as e:
-                        response += f"  Error getting sample: {e}\n"
-        except Exception as e:
-            response += f"\nError accessing collections: {e}"
-        
-        return response
-
-    debug_tool = FunctionTool.from_defaults(
-        name="debug_info",
-        description="Get debug information about the available tools and their data collections.",
-        fn=debug_tools
-    )
-
-    # Add the debug tool to the list
-    # query_engine_tools.append(debug_tool)
+    # The debug tool is only built on request, so agents normally never import or create it
+    if DEBUG_TOOLS:
+        from .debug import create_debug_tool
+        query_engine_tools.append(create_debug_tool(pr_id, query_engine_tools))
     
     # Add the review tool, but only in co_reviewer mode
     if mode == "co_reviewer":
-        print(f"Adding review tool for co_reviewer mode")
+        logger.debug("Adding review tool for co_reviewer mode")
         review_tool = create_review_tool(query_engine_tools, pr_id)
         query_engine_tools.append(review_tool)
 
     # Adjust system prompt based on mode
-    if mode == "co_reviewer":
-        system_prompt = SYSTEM_PROMPT_CO_REVIEWER
-    elif mode == "interactive_assistant":
-        system_prompt = SYSTEM_PROMPT_INTERACTIVE_ASSISTANT
-    else:
+    if mode not in _MODE_FORMATTERS:
         print(f"Error: Invalid mode {mode}")
         return None
 
     # Use a custom ReActChatFormatter with the full system prompt
-    from llama_index.core.agent.react.formatter import ReActChatFormatter
-    custom_formatter = ReActChatFormatter.from_defaults(system_header=system_prompt)
+    custom_formatter = _MODE_FORMATTERS[mode]
 
     # Set up callback manager with SimpleLLMHandler to log full messages
     #callback_manager = CallbackManager(handlers=[SimpleLLMHandler()])
 
-    print(f"Creating ReActAgent with {len(query_engine_tools)} tools for {pr_id} in mode {mode}")
-    agent = ReActAgent.from_tools(
+    logger.debug("Creating ReActAgent with %d tools for %s in mode %s", len(query_engine_tools), pr_id, mode)
+    agent = _TurnScopedReActAgent.from_tools(
         tools=query_engine_tools,
         llm=Settings.llm,
         react_chat_formatter=custom_formatter,
-        max_iterations=15,
-        verbose=True,  # Set to False in production
+        max_iterations=AGENT_MAX_ITERATIONS,
+        verbose=AGENT_VERBOSE,
     #    callback_manager=callback_manager,  # Attach the callback manager
     )
+    agent._repeat_guard = repeat_guard
     # Override system prompts using PromptTemplate.from_defaults to fill required placeholders
-    custom_prompt_template = PromptTemplate(system_prompt)
     agent.update_prompts({
-        "react_header": custom_prompt_template,
+        "react_header": _MODE_PROMPT_TEMPLATES[mode],
     })
-    prompts = agent.get_prompts()
-    print(prompts)
+    # The prompts are only rendered when debug logging is on
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Agent prompts: %s", agent.get_prompts())
     return agent
 
 # --- Session Management ---
+# Sessions kept in memory; the least recently used one is dropped beyond this
+MAX_AGENT_SESSIONS = int(os.getenv("MAX_AGENT_SESSIONS", "64"))
+
+class _SessionLRU(OrderedDict):
+    """Agent instances per session_id, evicting the least recently used session (and its chat history)."""
+    
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+    
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            evicted_key, _ = self.popitem(last=False)
+            chat_history.pop(evicted_key, None)
+            logger.debug("Evicted agent session: %s", evicted_key)
+
 # Dictionaries to hold agent instances and chat history per session_id
 # In a real app, use a more robust session management solution with persistence
-agent_sessions: Dict[str, ReActAgent] = {} 
+agent_sessions: Dict[str, ReActAgent] = _SessionLRU(MAX_AGENT_SESSIONS)
 chat_history: Dict[str, List] = {} 
 
+# Chat histories are written through to SQLite, so they survive restarts and evictions
+CHAT_HISTORY_DB = os.getenv("CHAT_HISTORY_DB", "chat_history.db")
+_history_lock = threading.Lock()
+
+@lru_cache(maxsize=1)
+def _get_history_db() -> sqlite3.Connection:
+    """Opens the chat history database on first use."""
+    conn = sqlite3.connect(CHAT_HISTORY_DB, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS hist (session TEXT NOT NULL, idx INTEGER NOT NULL, msg TEXT NOT NULL, PRIMARY KEY (session, idx))")
+    conn.commit()
+    return conn
+
+def _load_chat_history(session_id: str) -> List:
+    """Reads the persisted chat history of a session (empty for a new session)."""
+    with _history_lock:
+        rows = _get_history_db().execute(
+            "SELECT msg FROM hist WHERE session = ? ORDER BY idx", (session_id,)
+        ).fetchall()
+    return [json.loads(msg) for (msg,) in rows]
+
+def _message_to_json(message) -> str:
+    """Serializes a chat message as {"role", "content"}, failing on values JSON can't round-trip."""
+    if not isinstance(message, dict):
+        # llama-index ChatMessage
+        message = {"role": getattr(message.role, "value", message.role), "content": message.content}
+    return json.dumps(message)
+
 def get_agent_for_pr(pr_id: str, mode: str, session_id: str = None) -> ReActAgent:
     """
     Gets or creates an agent instance for a given session.
@@ -339,9 +770,11 @@ def get_agent_for_pr(pr_id: str, mode: str, session_id: str = None) -> ReActAgen
     session_key = session_id if session_id else pr_id
     
     if session_key not in agent_sessions:
-        print(f"Creating new agent for session: {session_key} (PR: {pr_id}, Mode: {mode})")
+        logger.debug("Creating new agent for session: %s (PR: %s, Mode: %s)", session_key, pr_id, mode)
         agent_sessions[session_key] = create_agent(pr_id, mode)
-        chat_history[session_key] = [] # Initialize chat history
+        chat_history[session_key] = _load_chat_history(session_key) # Initialize chat history
+    else:
+        agent_sessions.move_to_end(session_key)
     # Ensure agent creation was successful
     if agent_sessions.get(session_key) is None:
          # Handle the case where agent creation failed in create_agent
@@ -360,7 +793,10 @@ def get_chat_history(session_id: str) -> List:
      Returns:
          List of chat messages for the session or empty list if not found
      """
-     return chat_history.get(session_id, [])
+     if session_id in chat_history:
+         return chat_history[session_id]
+     # Sessions no longer in memory (evicted or from before a restart) are read from disk
+     return _load_chat_history(session_id)
 
 def add_to_chat_history(session_id: str, message):
      """
@@ -370,8 +806,18 @@ def add_to_chat_history(session_id: str, message):
          session_id: The unique session identifier
          message: The message to add to the history
      """
+     # Persisted even if the session was evicted from memory meanwhile, so no message is lost
+     msg = _message_to_json(message)
      if session_id in chat_history:
          chat_history[session_id].append(message)
+     with _history_lock:
+         conn = _get_history_db()
+         # The index continues from what is stored, which may be more than is in memory
+         conn.execute(
+             "INSERT INTO hist (session, idx, msg) SELECT ?, COALESCE(MAX(idx) + 1, 0), ? FROM hist WHERE session = ?",
+             (session_id, msg, session_id),
+         )
+         conn.commit()
 
 # --- Example Usage (Optional, for testing) ---
 if __name__ == "__main__":
@@ -0,0 +1,102 @@
+"""
+Debug tool reporting on the tools of a PR and a sample of its raw ChromaDB collections.
+
+Only imported when agents are created with DEBUG_TOOLS=1.
+"""
+
+import re
+from typing import List
+
+from llama_index.core.tools import FunctionTool
+
+from .agent import _collection_counts, _get_chroma_client, _index_paths
+
+CHANGE_RELATED_TERMS = ["diff", "file", "change", "add", "remove", "modif", "patch"]
+# The lookahead reports every term occurrence, including ones overlapping another term
+_CHANGE_TERMS_RE = re.compile("(?=(" + "|".join(map(re.escape, CHANGE_RELATED_TERMS)) + "))")
+
+def _build_debug_report(pr_id: str, tools: List[FunctionTool]) -> str:
+    """Builds a report on the available tools and a sample of their raw collections."""
+    response = f"Debug report for pr_id {pr_id}:\n"
+    response += f"Number of tools available: {len(tools)}\n"
+    
+    tool_names = [tool.metadata.name for tool in tools]
+    response += f"Tool names: {tool_names}\n"
+    
+    try:
+        # Try to access the ChromaDB collections directly for debugging
+        _, index_path = _index_paths(pr_id)
+        client = _get_chroma_client(index_path)
+        
+        response += "\nCollection information:\n"
+        for collection in client.list_collections():
+            # Collections the tools already counted aren't counted again; the indexes don't change while served
+            cached = _collection_counts.get((index_path, collection.name))
+            count = cached[0] if cached else collection.count()
+            response += f"- {collection.name}: {count} items\n"
+            
+            # If there are items, sample a few
+            if count > 0:
+                try:
+                    # Get a more substantial sample from PR data collection
+                    if "pr_data" in collection.name:
+                        response += f"\n*** DETAILED PR DATA ANALYSIS ***\n"
+                        sample = collection.get(limit=3)
+                        
+                        # Display document IDs and metadata
+                        response += f"  Sample documents:\n"
+                        for i, doc_id in enumerate(sample['ids']):
+                            response += f"  Doc {i+1} ID: {doc_id}\n"
+                            if sample['metadatas'][i]:
+                                response += f"  Metadata: {sample['metadatas'][i]}\n"
+                            
+                            # Show document text snippets (first 300 chars)
+                            doc_text = sample['documents'][i]
+                            if doc_text:
+                                snippet = doc_text[:300] + "..." if len(doc_text) > 300 else doc_text
+                                response += f"  Content snippet: {snippet}\n\n"
+                        
+                        # Try to identify fields related to file changes
+                        response += "\n  Looking for file diff related fields in documents...\n"
+                        # One scan per document collects the first position of every term
+                        first_hits = []
+                        for doc in sample['documents']:
+                            hits = {}
+                            if doc:
+                                for match in _CHANGE_TERMS_RE.finditer(doc.lower()):
+                                    hits.setdefault(match.group(1), match.start())
+                            first_hits.append((doc, hits))
+                        for term in CHANGE_RELATED_TERMS:
+                            for doc, hits in first_hits:
+                                if term in hits:
+                                    idx = hits[term]
+                                    context = doc[max(0, idx - 50):min(len(doc), idx + 150)]
+                                    response += f"  Found '{term}' context: '...{context}...'\n"
+                    else:
+                        # Regular sample for other collections
+                        sample = collection.get(limit=2)
+                        response += f"  Sample metadata: {sample['metadatas']}\n"
+                except Exception as e:
+                    response += f"  Error getting sample: {e}\n"
+    except Exception as e:
+        response += f"\nError accessing collections: {e}"
+    
+    return response
+
+def create_debug_tool(pr_id: str, tools: List[FunctionTool]) -> FunctionTool:
+    """Creates the debug_info tool for a PR's agent."""
+    # The indexes don't change during a session, so the report is built on the first call only
+    debug_report = None
+    
+    def debug_tools(input_text: str) -> str:
+        """Debug function to report on available tools and their raw collections."""
+        nonlocal debug_report
+        if debug_report is None:
+            debug_report = _build_debug_report(pr_id, tools)
+        return debug_report
+    
+    return FunctionTool.from_defaults(
+        name="debug_info",
+        description="Get debug information about the available tools and their data collections.",
+        fn=debug_tools
+    )
@@ -7,3 +7,6 @@ OPENAI_LLM_MODEL = "o4-mini"  # Main LLM model used throughout the application
 
 # OpenAI Embedding Models
 OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+# Vectors are truncated to this many dimensions by the API (1536 is the model's full size).
+# Must match between the indexing scripts and the agent; changing it requires a full reindex
+OPENAI_EMBEDDING_DIMS = 512
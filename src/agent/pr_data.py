@@ -1,7 +1,11 @@
 import os
 import json
+from functools import lru_cache
 from pathlib import Path
 
+# Resolved once at import instead of on every call
+PR_DATA_DIR = Path(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'pr_data')))
+
 
 def get_pr_data(project_name: str) -> str:
     """
@@ -17,18 +21,23 @@ def get_pr_data(project_name: str) -> str:
         FileNotFoundError: If the PR data file doesn't exist
     """
     # Construct the path to the pr.json file
-    pr_dir = Path(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'pr_data')))
-    pr_json_path = pr_dir / project_name / 'pr.json'
+    pr_json_path = PR_DATA_DIR / project_name / 'pr.json'
     
     # Check if the file exists
-    if not pr_json_path.exists():
-        raise FileNotFoundError(f"PR data file not found at {pr_json_path}")
-    
-    # Read and return the JSON content as a string
-    with open(pr_json_path, 'r', encoding='utf-8') as f:
-        pr_data = f.read()
+    try:
+        mtime_ns = os.stat(pr_json_path).st_mtime_ns
+    except FileNotFoundError:
+        raise FileNotFoundError(f"PR data file not found at {pr_json_path}") from None
     
-    return pr_data
+    # Read and return the JSON content as a string, re-read only if the file changed
+    return _read_pr_json(str(pr_json_path), mtime_ns)
+
+
+@lru_cache(maxsize=8)
+def _read_pr_json(path: str, mtime_ns: int) -> str:
+    """Reads a PR data file; cached per modification time, so repeated reviews of a PR don't re-read it."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
 
 
 # For testing - only runs when script is executed directly
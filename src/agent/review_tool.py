@@ -2,12 +2,14 @@ import os
 from typing import List, Dict, Optional
 from llama_index.core import Settings
 from llama_index.core.agent import ReActAgent
-from llama_index.core.tools import QueryEngineTool, FunctionTool, ToolMetadata
+from llama_index.core.tools import FunctionTool, ToolMetadata
 from llama_index.llms.openai import OpenAI
 
 from .pr_data import get_pr_data
 from .model_constants import OPENAI_LLM_MODEL
 
+AGENT_VERBOSE = os.getenv("AGENT_VERBOSE", "0") == "1"
+
 # Review-specific system prompt that focuses on instructions rather than data
 REVIEW_SYSTEM_PROMPT = """
 You are an expert AI code reviewer, responsible for conducting a comprehensive, structured analysis of a Pull Request (PR). You take initiative—surfacing insights, risks, and requirement alignments—to help a human reviewer make informed pass/fail decisions.
@@ -79,7 +81,7 @@ Assess the PR holistically across the categories below. **The bullet points unde
 - [ ] Confirm coding practices in `filename.ext` match existing patterns.
 """
 
-def create_review_tool(tools: List[QueryEngineTool], pr_id: str) -> FunctionTool:
+def create_review_tool(tools: List[FunctionTool], pr_id: str) -> FunctionTool:
     """
     Creates a tool that generates a comprehensive code review for a PR.
     
@@ -108,7 +110,7 @@ def create_review_tool(tools: List[QueryEngineTool], pr_id: str) -> FunctionTool
                 llm=OpenAI(model=OPENAI_LLM_MODEL, temperature=0.0),  # Use the same model as main agent
                 context=REVIEW_SYSTEM_PROMPT,
                 max_iterations=30,  # Allow more iterations for detailed review
-                verbose=True  # Keep verbose to see thought process
+                verbose=AGENT_VERBOSE  # Set AGENT_VERBOSE=1 to see the thought process
             )
             
             # Turn off verbose temporarily while sending the large PR data message
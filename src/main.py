@@ -7,6 +7,7 @@ import uuid
 from dotenv import load_dotenv
 from datetime import datetime
 import json
+import logging
 
 # Custom JSON encoder to handle datetime objects
 class DateTimeEncoder(json.JSONEncoder):
@@ -18,6 +19,9 @@ class DateTimeEncoder(json.JSONEncoder):
 # Load environment variables from .env file
 load_dotenv()
 
+# Agent and tool-loading details are logged at DEBUG; set LOG_LEVEL=DEBUG to see them
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(message)s")
+
 # Make sure agent modules are importable
 # If running from workspace root, imports should work
 # Otherwise, adjust PYTHONPATH if needed